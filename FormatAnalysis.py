@@ -1,5 +1,5 @@
 
-from collections import Counter
+import functools
 from pathlib import Path
 
 import pandas as pd
@@ -68,17 +68,71 @@ class MTGAnalyzer(param.Parameterized):
     def __init__(self, df, card_vectors, vocabulary, **params):
         super().__init__(**params)
         self.df = df
+        # Plain arrays of the columns the callbacks filter and aggregate on,
+        # so they can use numpy indexing instead of pandas .loc.
+        # Wins/Losses stay float as they are NaN for decks with invalid wr.
+        self._wins = df['Wins'].to_numpy(np.float64, copy=True)
+        self._losses = df['Losses'].to_numpy(np.float64, copy=True)
+        self._dates = pd.to_datetime(df['Date']).to_numpy('datetime64[D]')
+        self._invalid_wr = df['Invalid_WR'].to_numpy(bool)
+        # Date ordering of the decks, so a date range is just a slice of it.
+        self._date_order = np.argsort(self._dates, kind='stable')
+        self._sorted_dates = self._dates[self._date_order]
         self.X = card_vectors
         self.feature_names = vocabulary
+        # Column-major copy for fast per-card lookups.
+        # Stored entries are taken to mean "plays at least one copy", so drop any explicit zeros.
+        self.Xcsc = self.X.tocsc(copy=True)
+        self.Xcsc.eliminate_zeros()
         self.card_service = CardService()
+        # Column lookups only change when the deck selection does,
+        # so memoize them per card column and clear the cache in find_valid_rows.
+        self._valid_col_entries = functools.lru_cache(maxsize=128)(self._valid_col_entries)
         self._initialize_card_list()
+        self._initialize_card_matrix()
         self.find_valid_rows()
         
     def _initialize_card_list(self):
+        # Split the feature names into main and sideboard column lookups by card name,
+        # so nothing has to format f"{card}_SB" at query time.
+        #
+        self.mb_idx = {}
+        self.sb_idx = {}
+        for name, idx in self.feature_names.items():
+            if name.endswith('_SB'):
+                self.sb_idx[name[:-3]] = idx
+            else:
+                self.mb_idx[name] = idx
+
+        # Column index back to feature name, for labelling aggregates.
+        self.idx_card_map = {v: k for k, v in self.feature_names.items()}
+
         # Get unique cards from feature names, removing _SB suffix
-        self.card_options = sorted(list(set(
-            [name.replace('_SB', '') for name in self.feature_names.keys()]
-        )))
+        self.card_options = sorted(self.mb_idx.keys() | self.sb_idx.keys())
+        self.card_col = {card: i for i, card in enumerate(self.card_options)}
+
+    def _initialize_card_matrix(self):
+        # Main and sideboard copies of each card summed into a single column per card
+        # (in card_options order), for "does this deck play the card at all" queries.
+        # Fold the feature columns onto card columns with a (n_features, n_cards) 0/1 matrix.
+        #
+        features = np.fromiter(self.feature_names.values(), dtype=np.int64)
+        cards = np.fromiter(
+            (self.card_col[name[:-3] if name.endswith('_SB') else name] for name in self.feature_names),
+            dtype=np.int64,
+        )
+        fold = sparse.csr_array(
+            (np.ones(features.shape[0], dtype=np.int32), (features, cards)),
+            shape=(self.X.shape[1], len(self.card_options)),
+        )
+        Xcards = (self.X.astype(np.int32) @ fold).tocsc()
+        Xcards.eliminate_zeros()
+
+        # Keep uint8 to match X. A basic land could in principle pass 255 across main + sb,
+        # so saturate rather than wrap; presence only cares that it's nonzero.
+        #
+        Xcards.data = np.minimum(Xcards.data, np.iinfo(np.uint8).max).astype(np.uint8)
+        self.Xcards = Xcards
 
     def card_name_formatter(self, cell):
         card_name = cell['value']
@@ -88,6 +142,42 @@ class MTGAnalyzer(param.Parameterized):
         #
         return f"""<div class="card-name" data-card-image-url="{image_url}">{card_name}</div>"""
     
+    def _valid_col_entries(self, col):
+        """
+        Rows and stored values of column col, restricted to the currently valid decks.
+        """
+        start, end = self.Xcsc.indptr[col], self.Xcsc.indptr[col + 1]
+        rows = self.Xcsc.indices[start:end]
+        keep = self._valid_mask[rows]
+        return rows[keep], self.Xcsc.data[start:end][keep]
+
+    def _card_presence(self, cards):
+        """
+        Boolean matrix of shape (n_decks, n_known_cards) marking which decks play each card,
+        in either the main or the sideboard. Cards not in the vocabulary are skipped.
+        """
+        cols = [self.card_col[card] for card in cards if card in self.card_col]
+
+        # One gather of the combined card columns, then scatter each stored entry
+        # against the card it belongs to.
+        #
+        selected = self.Xcards[:, cols]
+        presence = np.zeros((self.X.shape[0], len(cols)), dtype=bool)
+        presence[selected.indices, np.repeat(np.arange(len(cols)), np.diff(selected.indptr))] = True
+
+        return presence
+
+    def _date_mask(self, start, end):
+        """
+        Boolean mask of decks played between start and end (inclusive).
+        """
+        lo = np.searchsorted(self._sorted_dates, np.datetime64(start, 'D'), side='left')
+        hi = np.searchsorted(self._sorted_dates, np.datetime64(end, 'D'), side='right')
+
+        date_mask = np.zeros(self.X.shape[0], dtype=bool)
+        date_mask[self._date_order[lo:hi]] = True
+        return date_mask
+
     @param.depends('date_range', 'selected_cards', 'excluded_cards', watch=True)
     def find_valid_rows(self):
         """
@@ -95,94 +185,26 @@ class MTGAnalyzer(param.Parameterized):
         """
 
         row_mask = np.ones(self.X.shape[0], dtype=bool)
-        
-        for pair_idx, pair in enumerate(
-            [(self.feature_names.get(c), self.feature_names.get(f"{c}_SB")) for c in self.selected_cards]
-            # + [(self.feature_names.get(self.selected_card), self.feature_names.get(f"{self.selected_card}_SB"))]
-        ):
-            # Check pair format
-            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
-                raise ValueError(f"Each pair must be a tuple/list of length 2. Error in pair {pair_idx}: {pair}")
-            
-            col1, col2 = pair
-            pair_rows = set()
-            
-            # Handle col1
-            if col1 is not None:
-                if not isinstance(col1, (int, np.integer)):
-                    raise TypeError(f"Column index must be integer or None. Got {type(col1)} for column 1 in pair {pair_idx}")
-                if col1 < 0 or col1 >= self.X.shape[1]:
-                    raise ValueError(f"Column index {col1} out of bounds for matrix with {self.X.shape[1]} columns")
-                pair_rows.update(self.X.getcol(col1).nonzero()[0])
-                
-            # Handle col2
-            if col2 is not None:
-                if not isinstance(col2, (int, np.integer)):
-                    raise TypeError(f"Column index must be integer or None. Got {type(col2)} for column 2 in pair {pair_idx}")
-                if col2 < 0 or col2 >= self.X.shape[1]:
-                    raise ValueError(f"Column index {col2} out of bounds for matrix with {self.X.shape[1]} columns")
-                pair_rows.update(self.X.getcol(col2).nonzero()[0])
-            
-            # If both columns in a pair are None, skip this pair
-            if col1 is None and col2 is None:
-                continue
-                
-            # Create mask for current pair
-            current_mask = np.zeros(self.X.shape[0], dtype=bool)
-            current_mask[list(pair_rows)] = True
-            
-            # Update overall mask (AND condition)
-            row_mask &= current_mask
-            
-        for pair_idx, pair in enumerate(
-            [(self.feature_names.get(c), self.feature_names.get(f"{c}_SB")) for c in self.excluded_cards]
-        ):
-            # Check pair format
-            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
-                raise ValueError(f"Each pair must be a tuple/list of length 2. Error in pair {pair_idx}: {pair}")
-            
-            col1, col2 = pair
-            pair_rows = set()
-            
-            # Handle col1
-            if col1 is not None:
-                if not isinstance(col1, (int, np.integer)):
-                    raise TypeError(f"Column index must be integer or None. Got {type(col1)} for column 1 in pair {pair_idx}")
-                if col1 < 0 or col1 >= self.X.shape[1]:
-                    raise ValueError(f"Column index {col1} out of bounds for matrix with {self.X.shape[1]} columns")
-                pair_rows.update(self.X.getcol(col1).nonzero()[0])
-                
-            # Handle col2
-            if col2 is not None:
-                if not isinstance(col2, (int, np.integer)):
-                    raise TypeError(f"Column index must be integer or None. Got {type(col2)} for column 2 in pair {pair_idx}")
-                if col2 < 0 or col2 >= self.X.shape[1]:
-                    raise ValueError(f"Column index {col2} out of bounds for matrix with {self.X.shape[1]} columns")
-                pair_rows.update(self.X.getcol(col2).nonzero()[0])
-            
-            # If both columns in a pair are None, skip this pair
-            if col1 is None and col2 is None:
-                continue
-                
-            # Create mask for current pair
-            current_mask = np.zeros(self.X.shape[0], dtype=bool)
-            current_mask[list(pair_rows)] = True
-            
-            # Update overall mask (AND condition)
-            row_mask &= ~current_mask
+
+        # Decks must contain every required card, and none of the excluded ones.
+        #
+        row_mask &= self._card_presence(self.selected_cards).all(axis=1)
+        row_mask &= ~self._card_presence(self.excluded_cards).any(axis=1)
 
         # Add time bounds filter
         # print(self.df.head())
         # print(self.date_range)
         if self.date_range:
-            row_mask &= (self.df['Date'] >= self.date_range[0]) & (self.df['Date'] <= self.date_range[1])
+            row_mask &= self._date_mask(*self.date_range)
             # if self.date_range[1]:
             #     row_mask 
         
         # Return row indices that satisfy all conditions
         # print(row_mask)
+        self._valid_mask = row_mask
+        self._valid_col_entries.cache_clear()
         self.valid_rows = np.where(row_mask)[0]
-        self.valid_wr_rows = np.where(row_mask & ~self.df['Invalid_WR'])[0]
+        self.valid_wr_rows = np.where(row_mask & ~self._invalid_wr)[0]
         # print(self.valid_wr_rows)
 
     @param.depends('valid_wr_rows')
@@ -198,9 +220,13 @@ class MTGAnalyzer(param.Parameterized):
             ),
         )
 
-    @param.depends('valid_wr_rows')
-    def get_deck_view(self):
-        valid_cards = np.unique(self.X[self.valid_rows].nonzero()[1])
+    def _deck_counts(self, rows):
+        """
+        Fraction of the given decks playing each number of copies of each card, indexed by feature name.
+        Returns the frame and its copy count columns.
+        """
+        X_rows = self.X[rows]
+        valid_cards = np.unique(X_rows.nonzero()[1])
         # if valid_cards.shape[0] > 500:
         #     return pn.pane.Markdown(
         #         f'''Too many cards to display deck aggregation. Make a more restrictive filter.
@@ -212,14 +238,13 @@ class MTGAnalyzer(param.Parameterized):
         #
         counts_df = pd.DataFrame(
             sparse_column_value_counts(
-                self.X[self.valid_rows][:, valid_cards]
+                X_rows[:, valid_cards]
             )
         ).fillna(0)
 
         # Index properly by card name.
         #
-        idx_card_map = {v: k for k, v in self.feature_names.items()}
-        counts_df.index = [idx_card_map.get(c) for c in valid_cards]
+        counts_df.index = [self.idx_card_map.get(c) for c in valid_cards]
         counts_df.index.name = 'Card'
 
         # Handle for when we have more than 4 of a card.
@@ -238,6 +263,25 @@ class MTGAnalyzer(param.Parameterized):
         counts_df = counts_df[col_list]
         counts_df.fillna(0)
 
+        return counts_df, col_list
+
+    @functools.cached_property
+    def _all_deck_counts(self):
+        """
+        Deck counts over every loaded deck. These never change, so only work them out once.
+        """
+        return self._deck_counts(np.arange(self.X.shape[0]))
+
+    @param.depends('valid_wr_rows')
+    def get_deck_view(self):
+        # With no effective filter (e.g. no date range or cards chosen yet)
+        # the aggregate is always the same, so reuse it.
+        #
+        if self.valid_rows.shape[0] == self.X.shape[0]:
+            counts_df, col_list = self._all_deck_counts
+        else:
+            counts_df, col_list = self._deck_counts(self.valid_rows)
+
         # Split into main/sb.
         #
         mb_counts_df = counts_df.loc[
@@ -302,31 +346,33 @@ class MTGAnalyzer(param.Parameterized):
             return pn.pane.Markdown("Select a card and enable correlation view to see analysis")
             
         # Calculate correlation matrix for main/sideboard copies
-        mb_idx = self.feature_names.get(self.selected_card)
-        sb_idx = self.feature_names.get(f"{self.selected_card}_SB")
+        mb_idx = self.mb_idx.get(self.selected_card)
+        sb_idx = self.sb_idx.get(self.selected_card)
         
         if (mb_idx is None) and (sb_idx is None):
             return pn.pane.Markdown("Card not found in dataset")
         
         if mb_idx is None:
-            mb_copies = [np.nan]
-            _, _, sb_copies = sparse.find(self.X[self.valid_rows][:, sb_idx])
-            n_decks = sb_copies.shape[0]
+            sb_d, sb_copies = self._valid_col_entries(sb_idx)
+            n_decks = sb_d.shape[0]
+            mb_y = np.full(5, np.nan)
+            sb_y = copy_count_frequencies(sb_copies, n_decks)
         elif sb_idx is None:
-            sb_copies = [np.nan]
-            _, _, mb_copies = sparse.find(self.X[self.valid_rows][:, mb_idx])
-            n_decks = mb_copies.shape[0]
+            mb_d, mb_copies = self._valid_col_entries(mb_idx)
+            n_decks = mb_d.shape[0]
+            mb_y = copy_count_frequencies(mb_copies, n_decks)
+            sb_y = np.full(5, np.nan)
         else:
-            mb_d, _ = self.X[self.valid_rows][:, mb_idx].nonzero()
-            sb_d, _ = self.X[self.valid_rows][:, sb_idx].nonzero()
-            d = set(np.concatenate([mb_d, sb_d]))
-            mb_copies = self.X[self.valid_rows][list(d), mb_idx].toarray().flatten()
-            sb_copies = self.X[self.valid_rows][list(d), sb_idx].toarray().flatten()
-            n_decks = len(d)
-
-        bins = np.arange(-0.5, np.nanmax([np.nanmax(mb_copies), np.nanmax(sb_copies), 5]), 1)
-        mb_y, _ = np.histogram(mb_copies, bins, density=True)
-        sb_y, _ = np.histogram(sb_copies, bins, density=True)
+            mb_d, mb_copies = self._valid_col_entries(mb_idx)
+            sb_d, sb_copies = self._valid_col_entries(sb_idx)
+            # Both row lists come sorted and unique from the CSC matrix,
+            # so count their overlap by binary search instead of sorting their union.
+            #
+            pos = np.minimum(np.searchsorted(mb_d, sb_d), max(mb_d.shape[0] - 1, 0))
+            n_both = np.count_nonzero(mb_d[pos] == sb_d) if mb_d.shape[0] else 0
+            n_decks = mb_d.shape[0] + sb_d.shape[0] - n_both
+            mb_y = copy_count_frequencies(mb_copies, n_decks)
+            sb_y = copy_count_frequencies(sb_copies, n_decks)
 
         return hv.Bars(
             pd.DataFrame({
@@ -343,6 +389,49 @@ class MTGAnalyzer(param.Parameterized):
             title=f"Qtty Frequency",
         )
     
+    def _win_rates_by_copies(self, col, total_wins, total_losses, offset=0):
+        """
+        Win rate (with binomial CI) of the valid wr decks, split by how many copies of column col they play.
+        total_wins and total_losses are over all valid wr decks.
+        Copies are 0-4, and returned x positions are shifted by offset so main/sb points don't overlap.
+        """
+        # Total up wins and losses per copy count over the decks that play the card,
+        # then whatever is left over belongs to the decks playing 0 copies.
+        #
+        rows, copies = self._valid_col_entries(col)
+        keep = ~self._invalid_wr[rows]
+        rows, copies = rows[keep], copies[keep]
+
+        wins_per = np.bincount(copies, weights=self._wins[rows], minlength=5)
+        losses_per = np.bincount(copies, weights=self._losses[rows], minlength=5)
+        wins_per[0] = total_wins - wins_per.sum()
+        losses_per[0] = total_losses - losses_per.sum()
+
+        win_rates = []
+        for i in range(5):  # 0-4 copies
+            wins = wins_per[i]
+            total = wins + losses_per[i]
+            if total:
+                ci = binomtest(k=int(wins), n=int(total)).proportion_ci()
+                winrate = wins/total
+                win_rates.append({
+                    'copies': i+offset,
+                    'winrate': winrate,
+                    'errmin': winrate - ci.low,
+                    'errmax': ci.high - winrate,
+                })
+            else:
+                # For completeness
+                #
+                win_rates.append({
+                    'copies': i+offset,
+                    'winrate': np.nan,
+                    'errmin': np.nan,
+                    'errmax': np.nan,
+                })
+
+        return win_rates
+
     @param.depends('selected_card', 'valid_wr_rows')
     def get_winrate_analysis(self):
         """Todo: Error bars, total."""
@@ -351,41 +440,18 @@ class MTGAnalyzer(param.Parameterized):
             
         # Calculate win rates by copy count
         
-        if not self.selected_card in self.feature_names:
+        if not self.selected_card in self.mb_idx:
             return pn.pane.Markdown("Card not found in dataset")
         
         plots = list()
+
+        total_wins = self._wins[self.valid_wr_rows].sum()
+        total_losses = self._losses[self.valid_wr_rows].sum()
         
-        mb_idx = self.feature_names.get(self.selected_card)
-        if mb_idx is not None:    
-            copy_counts = self.X[self.valid_wr_rows][:, mb_idx].toarray()
+        mb_idx = self.mb_idx.get(self.selected_card)
+        if mb_idx is not None:
+            mb_win_rates = self._win_rates_by_copies(mb_idx, total_wins, total_losses, offset=-0.1)
 
-            # print(self.df.loc[self.valid_wr_rows,['Wins']].value_counts(), copy_counts)
-            
-            mb_win_rates = []
-            for i in range(5):  # 0-4 copies
-                mask = copy_counts == i
-                wins = self.df.loc[self.valid_wr_rows].reset_index().loc[mask.ravel(), 'Wins'].sum()
-                total = wins + self.df.loc[self.valid_wr_rows].reset_index().loc[mask.ravel(), 'Losses'].sum()
-                if total:
-                    ci = binomtest(k=int(wins), n=int(total)).proportion_ci()
-                    winrate = wins/total if total else np.nan
-                    mb_win_rates.append({
-                        'copies': i-0.1, 
-                        'winrate': winrate,
-                        'errmin': winrate - ci.low,
-                        'errmax': ci.high - winrate,
-                    })
-                else:
-                    # For completeness
-                    #
-                    mb_win_rates.append({
-                        'copies': i-0.1, 
-                        'winrate': np.nan,
-                        'errmin': np.nan,
-                        'errmax': np.nan,
-                    })
-            
             plots.append(hv.Scatter(
                 mb_win_rates, 'copies', 'winrate', label='Main',
             ).opts(size=7,))
@@ -393,35 +459,10 @@ class MTGAnalyzer(param.Parameterized):
                 mb_win_rates, 'copies', vdims=['winrate', 'errmin', 'errmax'],
             ))
 
-        sb_idx = self.feature_names.get(f'{self.selected_card}_SB')
-        if sb_idx is not None:    
-            copy_counts = self.X[self.valid_wr_rows][:, sb_idx].toarray()
-            
-            sb_win_rates = []
-            for i in range(5):  # 0-4 copies
-                mask = copy_counts == i
-                wins = self.df.loc[self.valid_wr_rows].reset_index().loc[mask.ravel(), 'Wins'].sum()
-                total = wins + self.df.loc[self.valid_wr_rows].reset_index().loc[mask.ravel(), 'Losses'].sum()
-
-                if total:
-                    ci = binomtest(k=int(wins), n=int(total)).proportion_ci()
-                    winrate = wins/total if total else np.nan
-                    sb_win_rates.append({
-                        'copies': i+0.1, 
-                        'winrate': winrate,
-                        'errmin': winrate - ci.low,
-                        'errmax': ci.high - winrate,
-                    })
-                else:
-                    # For completeness
-                    #
-                    sb_win_rates.append({
-                        'copies': i+0.1, 
-                        'winrate': np.nan,
-                        'errmin': np.nan,
-                        'errmax': np.nan,
-                    })
-            
+        sb_idx = self.sb_idx.get(self.selected_card)
+        if sb_idx is not None:
+            sb_win_rates = self._win_rates_by_copies(sb_idx, total_wins, total_losses, offset=0.1)
+
             plots.append(hv.Scatter(
                 sb_win_rates, 'copies', 'winrate', label='Sideboard',
             ).opts(size=7,))
@@ -431,9 +472,7 @@ class MTGAnalyzer(param.Parameterized):
 
         # Add helper lines.
         #
-        wins = self.df.loc[self.valid_wr_rows]['Wins'].sum()
-        total = wins + self.df.loc[self.valid_wr_rows]['Losses'].sum()
-        wr = wins/total
+        wr = total_wins/(total_wins + total_losses)
         # return hv.Curve([(0.5, 0.5),(5.5, 0.5)], 'copies', label='50% wr').opts(color='k', line_dash='dotted')
 
         plots.extend([
@@ -470,7 +509,7 @@ def load_data(data_path='processed_data', lookback_days=365):
     Returns:
     --------
     tuple
-        (DataFrame with deck data, sparse matrix of card counts, fitted CountVectorizer vocabulary)
+        (DataFrame with deck data, sparse array of card counts, fitted CountVectorizer vocabulary)
     """
     # Load the preprocessed data
     with open(Path(data_path) / 'deck_data.json', 'r') as f:
@@ -478,19 +517,45 @@ def load_data(data_path='processed_data', lookback_days=365):
         
     # Convert to DataFrame
     df = pd.DataFrame(data['decks'])
-    df['Date'] = pd.to_datetime(df['Date']).dt.date
-    
+    X = sparse.load_npz(Path(data_path) / 'card_vectors.npz')
+
     # Load cluster labels
     # df['Cluster'] = data['clusters']
 
-    # Filter to recent data
-    cutoff_date = (pd.to_datetime('today') - pd.Timedelta(days=lookback_days)).date()
+    # Put the decks in date order (they normally already are),
+    # so the lookback cutoff is a single leading row slice rather than a boolean row mask.
+    # ISO dates sort lexicographically, so this works on the raw strings.
+    #
+    raw_dates = np.asarray([deck['Date'] for deck in data['decks']], dtype='U10')
+    if np.any(raw_dates[1:] < raw_dates[:-1]):
+        order = np.argsort(raw_dates, kind='stable')
+        raw_dates = raw_dates[order]
+        df = df.iloc[order]
+        X = X[order]
+
+    # Filter to recent data, and only parse the dates of decks we keep.
+    #
+    cutoff_date = (pd.to_datetime('today') - pd.Timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+    i_lo = np.searchsorted(raw_dates, cutoff_date, side='left')
+
+    df = df.iloc[i_lo:].reset_index(drop=True)
+    df['Date'] = pd.to_datetime(raw_dates[i_lo:]).date
+    X = X[i_lo:]
+
+    # Use the sparse array interface so reductions give ndarrays, not np.matrix.
+    X = sparse.csr_array(X)
+
+    # Copy counts are small non-negative integers, so store them as uint8 to cut the bytes
+    # every column scan has to move. Basic lands can run well past 4, but never past 255.
+    # Anything summing over many decks needs to accumulate in a wider type.
+    #
+    if X.nnz and (X.data.min() < 0 or X.data.max() > np.iinfo(np.uint8).max):
+        raise ValueError(f"Card counts must be between 0 and 255. Got range {X.data.min()} to {X.data.max()}")
+    X.data = X.data.astype(np.uint8, copy=False)
+    if X.nnz <= np.iinfo(np.int32).max:
+        X.indices = X.indices.astype(np.int32, copy=False)
+        X.indptr = X.indptr.astype(np.int32, copy=False)
 
-    # Load card vectors
-    X = sparse.load_npz(Path(data_path) / 'card_vectors.npz')[df['Date'] >= cutoff_date]
-
-    df = df[df['Date'] >= cutoff_date].reset_index()
-    
     # Load and reconstruct vectorizer
     with open(Path(data_path) / 'vectorizer.json', 'r') as f:
         vectorizer_data = json.load(f)
@@ -507,7 +572,7 @@ def sparse_column_value_counts(sparse_matrix, normalize=True):
     
     Parameters:
     -----------
-    sparse_matrix : scipy.sparse.spmatrix
+    sparse_matrix : scipy.sparse.sparray or scipy.sparse.spmatrix
         Input sparse matrix (will be converted to CSC format internally)
     normalize : bool, default=True
         If True, returns the relative frequency of values. If False, returns counts.
@@ -519,54 +584,93 @@ def sparse_column_value_counts(sparse_matrix, normalize=True):
         If normalize=True, counts are replaced with frequencies.
     """
     # Convert to CSC for efficient column access
-    if not sparse.isspmatrix_csc(sparse_matrix):
+    if sparse_matrix.format != 'csc':
         csc_matrix = sparse_matrix.tocsc()
     else:
         csc_matrix = sparse_matrix
     
     n_rows, n_cols = csc_matrix.shape
-    result = []
+    nnz_per_col = np.diff(csc_matrix.indptr)
+    empty_cols = nnz_per_col == 0
+
+    # Count explicitly stored values, one pass over the data per distinct value.
+    # reduceat needs every start index to be valid, so pad the data by one,
+    # and it returns the element at the start index for empty segments,
+    # so zero those out afterwards.
+    #
+    unique_vals = np.unique(csc_matrix.data)
+    counts = np.zeros((len(unique_vals), n_cols), dtype=np.int64)
+    for i, v in enumerate(unique_vals):
+        mask = (csc_matrix.data == v).astype(np.int64)
+        counts[i] = np.add.reduceat(np.r_[mask, 0], csc_matrix.indptr[:-1])
+    counts[:, empty_cols] = 0
+
+    # Add count for zeros (elements not explicitly stored)
+    zeros_count = n_rows - nnz_per_col
+
+    # Normalize if requested
+    if normalize:
+        counts = counts / n_rows
+        zeros_count = zeros_count / n_rows
+
+    # Only visit the (value, column) pairs that actually occur.
+    #
+    result = [{} for _ in range(n_cols)]
+    for val_idx, col_idx in zip(*np.nonzero(counts)):
+        result[col_idx][unique_vals[val_idx]] = counts[val_idx, col_idx]
+    for col_idx in np.nonzero(zeros_count)[0]:
+        counter = result[col_idx]
+        counter[0] = counter.get(0, 0) + zeros_count[col_idx]
+
+    return result
+
+def copy_count_frequencies(copies, n_rows, max_copies=4):
+    """
+    Relative frequency of 0 to max_copies copies of a card, from the stored entries of its column.
     
-    for col_idx in range(n_cols):
-        # Get column data and row indices
-        start = csc_matrix.indptr[col_idx]
-        end = csc_matrix.indptr[col_idx + 1]
-        data = csc_matrix.data[start:end]
-        
-        # Count explicitly stored values
-        counter = Counter(data)
-        
-        # Add count for zeros (elements not explicitly stored)
-        explicit_entries = end - start
-        zeros_count = n_rows - explicit_entries
-        if zeros_count > 0:
-            counter[0] = zeros_count
-        
-        # Normalize if requested
-        if normalize:
-            total = n_rows
-            counter = {k: v / total for k, v in counter.items()}
-        
-        result.append(counter)
+    Parameters:
+    -----------
+    copies : np.ndarray
+        Nonzero copy counts stored for the card
+    n_rows : int
+        Number of decks considered. Any deck without a stored entry plays 0 copies.
+    max_copies : int, default=4
+        Largest copy count to report. Decks playing more are left out, including from the normalization.
     
-    return result
+    Returns:
+    --------
+    np.ndarray
+        Frequencies for 0 to max_copies copies, summing to 1 (NaN if there are no decks to count).
+    """
+    counts = np.bincount(copies, minlength=max_copies + 1)[:max_copies + 1]
+    counts[0] = n_rows - copies.shape[0]
+
+    total = counts.sum()
+    if not total:
+        return np.full(max_copies + 1, np.nan)
+    return counts / total
+
+# Template for vertical_bar_html, built once. Only the percentage is substituted.
+#
+_BAR_TPL = (
+    '<div style="margin: 0 auto; position: relative; width: 30px; height: 20px; background-color: #f0f0f0; border-radius: 3px;">'
+    '<div style="position: absolute; bottom: 0; left: 0; width: 100%; height: {p}%; background-color: #6495ED; border-radius: 0 0 3px 3px;"></div>'
+    '<div style="position: absolute; width: 100%; text-align: center; top: 50%; transform: translateY(-50%); font-size: 10px;">{p:.0f}%</div>'
+    '</div>'
+)
 
 def vertical_bar_html(value):
     """
     Format a tabulator with a vertical bar to produce histograms across neighbouring columns.
     Input should already be normalized to between 0,1.
     """
-    if pd.isna(value):
+    # NaN is the only value not equal to itself. Cheaper than pd.isna for every cell.
+    if value != value:
         return ""
     
-    percent = max(0, min(100, value * 100))
+    percent = 0 if value <= 0 else 100 if value >= 1 else value * 100
     
-    return f"""
-        <div style="margin: 0 auto; position: relative; width: 30px; height: 20px; background-color: #f0f0f0; border-radius: 3px;">
-            <div style="position: absolute; bottom: 0; left: 0; width: 100%; height: {percent}%; background-color: #6495ED; border-radius: 0 0 3px 3px;"></div>
-            <div style="position: absolute; width: 100%; text-align: center; top: 50%; transform: translateY(-50%); font-size: 10px;">{percent:.0f}%</div>
-        </div>
-    """
+    return _BAR_TPL.format(p=percent)
 
 def hover_card_html(card):
     """